@@ -0,0 +1,15 @@
+################################################ CSV -> PARQUET CONVERSION ######################################################################
+# One-time conversion of the dashboard data to Parquet so the app can skip CSV parsing on cold start.
+# Run from the repo root:  python convert_to_parquet.py
+
+import pandas as pd
+
+df = pd.read_csv('reduced_data_to_plot_7.csv')
+
+# Store typed columns so the dashboard doesn't have to fix them up after loading
+df['date'] = pd.to_datetime(df['date'], errors='coerce')
+for c in ('season', 'start_station_name', 'end_station_name'):
+    df[c] = df[c].astype('category')
+
+df.to_parquet('reduced_data_to_plot_7.parquet', engine='pyarrow', index=False)
+print(f"Wrote reduced_data_to_plot_7.parquet ({len(df):,} rows)")
@@ -1,22 +1,11 @@
 ################################################ CITI BIKE DASHBOARD ##########################################################################
 
+import io
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
-from plotly.subplots import make_subplots
-import plotly.graph_objects as go
-import matplotlib.pyplot as plt
-from datetime import datetime as dt
-from numerize.numerize import numerize
-from PIL import Image
-
-# --- Try importing KeplerGL safely ---
-try:
-    from streamlit_keplergl import keplergl_static
-    from keplergl import KeplerGl
-    kepler_available = True
-except ModuleNotFoundError:
-    kepler_available = False
+# Plotly and PIL are imported inside the pages/helpers that use them to keep cold start light
 
 ########################################### Initial settings for the dashboard ##################################################################
 
@@ -38,8 +27,140 @@ page = st.sidebar.selectbox(
 
 ########################################### Import data ###########################################################################################
 
-df = pd.read_csv('reduced_data_to_plot_7.csv')
-top20_csv = pd.read_csv('top20.csv')
+# Columns each page actually reads; the Intro, map and Recommendations pages don't load the table at all
+# (the stations page reads 'season' plus whichever station column _detect_station_col finds in the header)
+WEATHER_COLUMNS = ('date', 'bike_rides_daily', 'avgTemp')
+# Calendar order for the season selector (plain categories would sort alphabetically)
+SEASON_ORDER = ['winter', 'spring', 'summer', 'fall']
+
+def _detect_station_col(columns):
+    # Find station column robustly (fallback detection)
+    station_candidates = [c for c in columns if 'start' in c and 'station' in c]
+    if station_candidates:
+        return station_candidates[0]
+    return next((c for c in columns if 'station' in c or 'name' in c), None)
+
+def _read_columns(path):
+    # Header only: lets the loaders pick columns before reading any rows
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def _data_source(path):
+    # Prefer the Parquet copy (see convert_to_parquet.py); fall back to the CSV if it hasn't been built or is older than the CSV
+    parquet_path = os.path.splitext(path)[0] + '.parquet'
+    if os.path.exists(parquet_path) and (not os.path.exists(path) or os.path.getmtime(parquet_path) >= os.path.getmtime(path)):
+        return parquet_path
+    return path
+
+# The loaders below take the source file's mtime only as part of the cache key (as load_html does),
+# so regenerating the data while the app is running invalidates them
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_main_df(path, cols=None, mtime=None):
+    cols = list(cols) if cols is not None else None
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path, engine='pyarrow', columns=cols)
+    else:
+        df = pd.read_csv(path, usecols=cols)
+    if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    station_col = _detect_station_col(df.columns)
+    # Low-cardinality strings as categories so filters/groupbys work on integer codes
+    if 'season' in df.columns:
+        # Known seasons in calendar order, then any other labels in the data so no trips are dropped
+        present = set(df['season'].dropna().unique())
+        known = [c for c in SEASON_ORDER if c in present]
+        extra = sorted(present - set(SEASON_ORDER), key=str)
+        df['season'] = df['season'].astype(pd.CategoricalDtype(known + extra, ordered=True))
+    if station_col is not None:
+        df[station_col] = df[station_col].astype('category')
+    return df, station_col
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_station_counts(path, mtime):
+    # Trips per (season, station) — seasons x stations rows, so re-aggregating it on a filter change is cheap
+    station_col = _detect_station_col(_read_columns(path))
+    if station_col is None:
+        return None, None
+    df, _ = load_main_df(path, ('season', station_col), mtime)
+    # dropna=False keeps trips with a missing station name so the per-season totals match the trip count
+    return df.value_counts(['season', station_col], sort=False, dropna=False).reset_index(name='value'), station_col
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_daily_df(path, mtime):
+    # The main table has one row per trip; the Weather chart only needs one point per day
+    df, _ = load_main_df(path, WEATHER_COLUMNS, mtime)
+    daily = (df
+             .drop_duplicates('date')
+             .sort_values('date')
+             .reset_index(drop=True))
+    # Make sure temperature is daily (not cumulative)
+    if daily['avgTemp'].max() > 100:  # crude check for cumulative data
+        daily['avgTemp_daily'] = daily['avgTemp'].diff().fillna(daily['avgTemp'])
+    else:
+        daily['avgTemp_daily'] = daily['avgTemp']
+    return daily
+
+MAX_IMAGE_WIDTH = 1460  # st.image's MAXIMUM_CONTENT_WIDTH; wider images get resized and re-encoded on every call
+
+@st.cache_resource(show_spinner=False)
+def load_image(path):
+    # Downscale to what st.image would display and cache the JPEG bytes, so st.image passes them through unchanged
+    from PIL import Image
+    with Image.open(path) as img:
+        if img.width > MAX_IMAGE_WIDTH:
+            img = img.resize((MAX_IMAGE_WIDTH, int(img.height * MAX_IMAGE_WIDTH / img.width)), resample=Image.BILINEAR)
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_html(path, mtime):
+    # mtime is only part of the cache key, so a regenerated map file is picked up without a restart;
+    # max_entries=1 drops the previous version's string when that happens.
+    # cache_resource (not cache_data) hands back the same immutable string instead of unpickling a fresh copy each rerun.
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+DATA_PATH = 'reduced_data_to_plot_7.csv'
+MAX_LINE_POINTS = 2000  # cap on points per line trace sent to the browser
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling: return the indices of n_out points that keep the shape of (x, y)."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # First and last points are always kept; the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            avg_x = x[end:edges[i + 2]].mean()
+            avg_y = y[end:edges[i + 2]].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        # Pick the point in this bucket forming the largest triangle with the previous pick and the next bucket's mean
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+try:
+    if page == 'Weather component and bike usage':
+        data_file = _data_source(DATA_PATH)
+        df_daily = load_daily_df(data_file, os.path.getmtime(data_file))
+    elif page == 'Most popular stations':
+        data_file = _data_source(DATA_PATH)
+        per_season, station_col = load_station_counts(data_file, os.path.getmtime(data_file))
+except FileNotFoundError as e:
+    st.error(f"Data file not found: {e}")
+    st.stop()
 
 
 ######################################### DEFINE THE PAGES #####################################################################
@@ -58,36 +179,32 @@ if page == "Intro page":
     st.markdown("The dropdown menu on the left 'Aspect Selector' will take you to the different aspects of the analysis our team looked at.")
 
     try:
-        myImage = Image.open("CitiBike.jpg")
+        myImage = load_image("CitiBike.jpg")
         st.image(myImage)
     except Exception as e:
         st.warning(f"Could not load image 'CitiBike.jpg': {e}")
 
 ### Create the dual-axis line chart page ###
 elif page == 'Weather component and bike usage':
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
 
-    # Ensure date column is datetime
-    if 'date' in df.columns:
-        try:
-            df['date'] = pd.to_datetime(df['date'])
-        except Exception:
-            pass
+    # Plain numpy arrays (datetime64 for dates) serialize faster in plotly than pandas Series
+    dates = df_daily['date'].to_numpy()
+
+    # Downsample long series so the browser only draws what it can show
+    x_ns = dates.astype('int64')
+    rides_idx = lttb(x_ns, df_daily['bike_rides_daily'], MAX_LINE_POINTS)
+    temp_idx = lttb(x_ns, df_daily['avgTemp_daily'], MAX_LINE_POINTS)
 
-    # Make sure temperature is daily (not cumulative)
-    if 'avgTemp' in df.columns:
-        if df['avgTemp'].max() > 100:  # crude check for cumulative data
-            df['avgTemp_daily'] = df['avgTemp'].diff().fillna(df['avgTemp'])
-        else:
-            df['avgTemp_daily'] = df['avgTemp']
-    
     # Create figure with secondary y-axis
     fig_2 = make_subplots(specs=[[{"secondary_y": True}]])
 
     # Daily Bike Rides (left axis)
     fig_2.add_trace(
         go.Scatter(
-            x=df['date'],
-            y=df['bike_rides_daily'],
+            x=dates[rides_idx],
+            y=df_daily['bike_rides_daily'].to_numpy()[rides_idx],
             name='Daily Bike Rides',
             line=dict(color='royalblue', width=3)
         ),
@@ -97,8 +214,8 @@ elif page == 'Weather component and bike usage':
     # Daily Temperature (right axis)
     fig_2.add_trace(
         go.Scatter(
-            x=df['date'],
-            y=df['avgTemp_daily'],
+            x=dates[temp_idx],
+            y=df_daily['avgTemp_daily'].to_numpy()[temp_idx],
             name='Daily Temperature',
             line=dict(color='firebrick', width=3)
         ),
@@ -141,62 +258,60 @@ elif page == 'Weather component and bike usage':
 
 ### Most Popular Stations Page ###
 elif page == 'Most popular stations':
+    import plotly.graph_objects as go
+
+    if station_col is None:
+        st.error("Could not find a station column in the main dataframe (df).")
+        st.stop()
 
     # Sidebar season filter
     with st.sidebar:
         season_filter = st.multiselect(
             label='Select the Season',
-            options=df['season'].unique(),
-            default=list(df['season'].unique())
+            options=per_season['season'].cat.categories,
+            default=list(per_season['season'].cat.categories)
         )
 
-    # Filter dataframe by selected seasons (copy to avoid SettingWithCopyWarning)
-    df1 = df.query('season == @season_filter').copy()
+    # Filter the precomputed per-season station counts (the trip-level table is never touched on reruns)
+    sel = per_season[per_season['season'].isin(season_filter)]
+    total_rides = int(sel['value'].sum())
 
-    if df1.empty:
+    if total_rides == 0:
         st.error("No data for the selected season(s). Please choose different season(s).")
     else:
         # Metric
-        total_rides = float(df1['bike_rides_daily'].count())
-        st.metric(label='Total Bike Rides', value=numerize(total_rides))
+        st.metric(label='Total Bike Rides', value=f'{total_rides:,}')
 
         # Compute counts per start station and take top 20
-        df1['value'] = 1
-        # Find station column robustly (fallback detection)
-        station_candidates = [c for c in df1.columns if ('start' in c and 'station' in c) or ('station' in c and 'start' in c)]
-        if station_candidates:
-            station_col_df = station_candidates[0]
-        else:
-            station_col_df = next((c for c in df1.columns if 'station' in c or 'name' in c), None)
-
-        if station_col_df is None:
-            st.error("Could not find a station column in the main dataframe (df).")
-            st.stop()
-
-        df_groupby_bar = df1.groupby(station_col_df, as_index=False).agg({'value': 'sum'})
-        top20_local = df_groupby_bar.nlargest(20, 'value').copy()
+        # Sum per station straight from the category codes (one integer pass, no hash-based groupby);
+        # code -1 is a missing station name and is left out of the chart
+        stations = sel[station_col].cat.categories
+        codes = sel[station_col].cat.codes.to_numpy()
+        named = codes >= 0
+        totals = np.bincount(codes[named], weights=sel['value'].to_numpy()[named], minlength=len(stations))
+        df_groupby_bar = pd.DataFrame({station_col: stations, 'value': totals.astype(np.int64)})
+        # Partial sort (quickselect) finds the 20th-largest count; keep everything tied with it so the
+        # station-name tie-break below picks the same top 20, in the same order, as nlargest(keep='first')
+        vals = df_groupby_bar['value'].to_numpy()
+        k = min(20, len(vals))
+        cutoff = np.partition(vals, -k)[-k]
+        top20_local = (df_groupby_bar[vals >= cutoff]
+                       .sort_values(['value', station_col], ascending=[False, True], kind='stable')
+                       .head(k))
 
         # Prepare x labels: shorten long station names for ticks to avoid clutter
-        def shorten(name, n=28):
-            return name if len(name) <= n else name[:n-1].rstrip() + '…'
-
-        top20_local['tick_label'] = top20_local[station_col_df].astype(str).apply(lambda x: shorten(x, n=28))
-
-        # Ensure numeric
-        top20_local['value'] = pd.to_numeric(top20_local['value'], errors='coerce').fillna(0)
+        names = top20_local[station_col].astype(str)
+        too_long = names.str.len() > 28
+        top20_local['tick_label'] = names.where(~too_long, names.str.slice(0, 27).str.rstrip() + '…')
 
         # Plot (clean layout)
         fig = go.Figure(
             go.Bar(
-                x=top20_local['tick_label'],
-                y=top20_local['value'],
-                text=top20_local['value'],
-                textposition='outside',
-                marker={'color': top20_local['value'], 'colorscale': 'Blues'},
-                hovertemplate=
-                    '<b>%{customdata[0]}</b><br>' +
-                    'Trips: %{y}<extra></extra>',
-                customdata=np.stack((top20_local[station_col_df].astype(str),), axis=-1)
+                x=top20_local['tick_label'].to_numpy(),
+                y=top20_local['value'].to_numpy(),
+                marker={'color': top20_local['value'].to_numpy(), 'colorscale': 'Blues'},
+                hovertemplate='<b>%{customdata}</b><br>Trips: %{y}<extra></extra>',
+                customdata=top20_local[station_col].astype(str).to_numpy()
             )
         )
 
@@ -212,7 +327,7 @@ elif page == 'Most popular stations':
         )
 
         # Tidy x-axis ticks (smaller font, angled, and centered)
-        fig.update_xaxes(tickangle=-35, tickfont=dict(size=10), tickmode='linear', ticklabelmode='period')
+        fig.update_xaxes(tickangle=-35, tickfont=dict(size=10), type='category')
         # Make y-axis clearer
         fig.update_yaxes(showgrid=True, gridwidth=0.5, gridcolor='rgba(255,255,255,0.05)')
 
@@ -230,8 +345,7 @@ elif page == 'Interactive map with aggregated bike trips':
 
     # Read file and keep in variable
     try:
-        with open(path_to_html, 'r', encoding='utf-8') as f:
-            html_data = f.read()
+        html_data = load_html(path_to_html, os.path.getmtime(path_to_html))
 
         # Show in webpage
         st.header("Aggregated Bike Trips in New York")
@@ -247,7 +361,7 @@ elif page == 'Interactive map with aggregated bike trips':
 
 elif page == 'Recommendations':
     st.header("Conclusions and recommendations")
-    bikes = Image.open("recs_page.jpg")  #source: https://www.freepik.com/free-photo/shadows-made-by-daylight-city-with-architecture_27830346.htm#fromView=search&page=1&position=12&uuid=c0c9642f-53c2-4dc3-ab28-20c8c4d57dc2&query=bike+rack+in+city
+    bikes = load_image("recs_page.jpg")  #source: https://www.freepik.com/free-photo/shadows-made-by-daylight-city-with-architecture_27830346.htm#fromView=search&page=1&position=12&uuid=c0c9642f-53c2-4dc3-ab28-20c8c4d57dc2&query=bike+rack+in+city
     st.image(bikes)
     st.markdown("This analysis shows that CitiBike should follow these recommendations.")
     st.markdown("- Add extra bikes during peak months (May to October) and decrease bikes in colder months to save cost.")